@@ -1,28 +1,182 @@
 import streamlit as st
-import json
+import altair as alt
+import pandas as pd
+import mmap
+import os
+import sys
+import secrets
+import stat
+import orjson
 from pathlib import Path
 from datetime import datetime
+from operator import itemgetter
+
+CURRENT_YEAR = datetime.now().year
+PAGE_SIZE = 25
+MENU_OPTIONS = (
+    "Add a Book",
+    "Remove a Book",
+    "Search for Books",
+    "View All Books",
+    "View Statistics",
+    "Save/Load Library"
+)
+GENRES = (
+    "Fiction", "Non-Fiction", "Science Fiction", "Fantasy", 
+    "Mystery", "Thriller", "Romance", "Biography", 
+    "History", "Self-Help", "Psychology" , "Computer Science", "Data Science", "Machine Learning", "Deep Learning", "Artificial Intelligence", "Business", "Economics", "Finance", "Marketing", "Management", "Other"
+)
 
 # Initialize session state for the library if it doesn't exist
 if 'library' not in st.session_state:
     st.session_state.library = []
+if 'library_version' not in st.session_state:
+    st.session_state.library_version = 0
+
+# Cache helpers
+CACHE_MAX_ENTRIES = 64
+
+def library_changed():
+    """Mark the library as modified so cached results are recomputed"""
+    st.session_state.library_version += 1
+
+def cached(cache_name, key, compute):
+    """Return compute() memoized in session state until the library changes"""
+    version = st.session_state.library_version
+    cache_version, cache = st.session_state.get(cache_name, (None, None))
+    # Drop everything computed for an older library
+    if cache_version != version:
+        cache = {}
+        st.session_state[cache_name] = (version, cache)
+    if key not in cache:
+        if len(cache) >= CACHE_MAX_ENTRIES:
+            cache.clear()
+        cache[key] = compute()
+    return cache[key]
+
+# Search key helpers
+SEARCH_FIELDS = ("title", "author", "genre")
+MIN_SEARCH_LENGTH = 2
+
+def add_search_keys(book):
+    """Store lowercase copies of the searchable fields on the book"""
+    for field in SEARCH_FIELDS:
+        book[f"_{field}_lc"] = book[field].lower()
+    # Genres repeat across many books, so share one string per genre
+    book['genre'] = sys.intern(book['genre'])
+    book['_genre_lc'] = sys.intern(book['_genre_lc'])
+    return book
+
+def without_search_keys(book):
+    """Return a copy of the book without its derived search keys"""
+    return {key: value for key, value in book.items() if not key.startswith('_')}
 
 # File handling functions
+def write_file_atomically(filename, data):
+    """Write data to a temporary file and move it over filename"""
+    tmp_path = f"{filename}.{secrets.token_hex(8)}.tmp"
+    # Created like open() would, so the process umask applies to new files
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    fd = os.open(tmp_path, flags, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Keep the permissions of the file being replaced
+        if Path(filename).exists():
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(filename).st_mode))
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def encode_library(books, filename):
+    """Encode books as a JSON array, or one book per line for .jsonl files"""
+    if filename.endswith('.jsonl'):
+        return b"".join(orjson.dumps(book, option=orjson.OPT_APPEND_NEWLINE) for book in books)
+    return orjson.dumps(books, option=orjson.OPT_INDENT_2)
+
+def decode_library(data, filename):
+    """Decode books saved by encode_library from a memory-mapped file"""
+    if filename.endswith('.jsonl'):
+        return [orjson.loads(line) for line in iter(data.readline, b"") if line.strip()]
+    with memoryview(data) as view:
+        return orjson.loads(view)
+
+def read_library_file(filename):
+    """Read a saved library without copying the file into a bytes object"""
+    with open(filename, 'rb') as f:
+        # Empty files cannot be memory-mapped, and only JSON Lines may be empty
+        if os.fstat(f.fileno()).st_size == 0:
+            if filename.endswith('.jsonl'):
+                return []
+            raise ValueError(f"{filename} is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return decode_library(mm, filename)
+
+def file_signature(filename):
+    """Return the size and modification time of filename, or None if it is missing"""
+    try:
+        file_stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+def remember_saved_file(filename):
+    """Record that the library currently matches the contents of filename"""
+    st.session_state.last_saved = (filename, st.session_state.library_version,
+                                   len(st.session_state.library), file_signature(filename))
+
+def books_added_since_save(filename):
+    """Return the books added since the last save to filename, or None if other changes were made"""
+    last_saved = st.session_state.get('last_saved')
+    if last_saved is None or last_saved[0] != filename:
+        return None
+    _, saved_version, saved_count, saved_signature = last_saved
+    # Another session may have rewritten the file since we last touched it
+    if saved_signature is None or file_signature(filename) != saved_signature:
+        return None
+    library = st.session_state.library
+    # Adding a book bumps the version and grows the library by one, while
+    # removing one bumps the version and shrinks it, so the two only move
+    # together when nothing but additions happened
+    if st.session_state.library_version - saved_version != len(library) - saved_count:
+        return None
+    return library[saved_count:]
+
 def save_library_to_file(filename="library.json"):
-    """Save the library to a JSON file"""
+    """Save the library to a JSON or JSON Lines file"""
     try:
-        with open(filename, 'w') as f:
-            json.dump(st.session_state.library, f)
+        new_books = books_added_since_save(filename)
+        if new_books == []:
+            st.info(f"No changes since the library was last saved to {filename}.")
+            return
+        if new_books is not None and filename.endswith('.jsonl'):
+            # Only append the new books instead of rewriting the whole file
+            data = encode_library([without_search_keys(book) for book in new_books], filename)
+            with open(filename, 'a+b') as f:
+                # Files written elsewhere may not end with a newline
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = b"\n" + data
+                f.write(data)
+        else:
+            books = [without_search_keys(book) for book in st.session_state.library]
+            write_file_atomically(filename, encode_library(books, filename))
+        remember_saved_file(filename)
         st.success(f"Library saved successfully to {filename}!")
     except Exception as e:
         st.error(f"Error saving library: {e}")
 
 def load_library_from_file(filename="library.json"):
-    """Load the library from a JSON file"""
+    """Load the library from a JSON or JSON Lines file"""
     try:
         if Path(filename).exists():
-            with open(filename, 'r') as f:
-                st.session_state.library = json.load(f)
+            books = read_library_file(filename)
+            st.session_state.library = [add_search_keys(book) for book in books]
+            library_changed()
+            # The library now matches the file, so saving it back is a no-op
+            remember_saved_file(filename)
             st.success(f"Library loaded successfully from {filename}!")
         else:
             st.warning(f"No saved library found at {filename}")
@@ -32,43 +186,50 @@ def load_library_from_file(filename="library.json"):
 # Book management functions
 def add_book(title, author, year, genre, read_status):
     """Add a new book to the library"""
-    new_book = {
+    new_book = add_search_keys({
         "title": title,
         "author": author,
         "year": year,
         "genre": genre,
         "read_status": read_status,
-        "added_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
+        "added_date": datetime.now().isoformat(sep=" ", timespec="seconds")
+    })
     st.session_state.library.append(new_book)
+    library_changed()
     st.success(f"Book '{title}' added successfully!")
 
-def remove_book(title):
-    """Remove a book from the library by title"""
-    removed = False
-    for i, book in enumerate(st.session_state.library):
-        if book['title'].lower() == title.lower():
-            st.session_state.library.pop(i)
-            removed = True
-            break
-    
-    if removed:
-        st.success(f"Book '{title}' removed successfully!")
-    else:
-        st.warning(f"Book '{title}' not found in the library.")
+def remove_book(position):
+    """Remove a book from the library by its position"""
+    # Positions rather than titles, since several books can share a title
+    if not 0 <= position < len(st.session_state.library):
+        st.warning("That book is no longer in the library.")
+        return
+
+    book = st.session_state.library.pop(position)
+    library_changed()
+    st.success(f"Book '{book['title']}' removed successfully!")
 
 def search_books(search_term, search_by="title"):
     """Search for books by title, author, or genre"""
-    results = []
-    for book in st.session_state.library:
-        if search_term.lower() in book[search_by].lower():
-            results.append(book)
-    return results
+    search_term = search_term.lower()
+    search_key = f"_{search_by}_lc"
+    return [book for book in st.session_state.library if search_term in book[search_key]]
+
+SORT_KEYS = {"Title": "_title_lc", "Author": "_author_lc", "Year": "year"}
 
-def calculate_statistics():
+def sort_books(library, sort_by, reverse_sort=False):
+    """Return the positions of the library's books in sorted order"""
+    if sort_by == "Recently Added":
+        # The library is kept in the order books were added
+        order = range(len(library))
+        return order if reverse_sort else order[::-1]
+    sort_keys = list(map(itemgetter(SORT_KEYS[sort_by]), library))
+    return sorted(range(len(library)), key=sort_keys.__getitem__, reverse=reverse_sort)
+
+def calculate_statistics(library):
     """Calculate library statistics"""
-    total_books = len(st.session_state.library)
-    read_books = sum(1 for book in st.session_state.library if book['read_status'])
+    total_books = len(library)
+    read_books = sum(map(itemgetter('read_status'), library))
     
     stats = {
         "total_books": total_books,
@@ -78,33 +239,27 @@ def calculate_statistics():
     }
     return stats
 
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES)
+def build_read_status_chart(read_books, unread_books):
+    """Build the read/unread bar chart, reused while the counts stay the same"""
+    data = pd.DataFrame({"Status": ["Read", "Unread"], "Books": [read_books, unread_books]})
+    return alt.Chart(data).mark_bar().encode(x="Status", y="Books")
+
 # Streamlit UI
 st.title("📚 Personal Library Manager")
 
-# Menu system
-menu_options = [
-    "Add a Book",
-    "Remove a Book",
-    "Search for Books",
-    "View All Books",
-    "View Statistics",
-    "Save/Load Library"
-]
-choice = st.sidebar.selectbox("Menu", menu_options)
-
-if choice == "Add a Book":
+# Pages are fragments so widget interactions only rerun the current page
+@st.fragment
+def render_add_book():
+    """Render the Add a Book page"""
     st.header("Add a New Book")
     with st.form("add_book_form"):
         col1, col2 = st.columns(2)
-        title = col1.text_input("Title*", placeholder="Book title")
-        author = col2.text_input("Author*", placeholder="Book author")
-        year = col1.number_input("Publication Year*", min_value=0, max_value=datetime.now().year)
-        genre = col2.selectbox("Genre*", [
-            "Fiction", "Non-Fiction", "Science Fiction", "Fantasy", 
-            "Mystery", "Thriller", "Romance", "Biography", 
-            "History", "Self-Help", "Psychology" , "Computer Science", "Data Science", "Machine Learning", "Deep Learning", "Artificial Intelligence", "Business", "Economics", "Finance", "Marketing", "Management", "Other"
-        ])
-        read_status = st.checkbox("I have read this book")
+        title = col1.text_input("Title*", placeholder="Book title", key="add_title")
+        author = col2.text_input("Author*", placeholder="Book author", key="add_author")
+        year = col1.number_input("Publication Year*", min_value=0, max_value=CURRENT_YEAR, key="add_year")
+        genre = col2.selectbox("Genre*", GENRES, key="add_genre")
+        read_status = st.checkbox("I have read this book", key="add_read_status")
         submitted = st.form_submit_button("Add Book")
         
         if submitted:
@@ -113,23 +268,31 @@ if choice == "Add a Book":
             else:
                 st.warning("Please fill in all required fields (marked with *)")
 
-elif choice == "Remove a Book":
+@st.fragment
+def render_remove_book():
+    """Render the Remove a Book page"""
     st.header("Remove a Book")
     if st.session_state.library:
-        book_titles = [book['title'] for book in st.session_state.library]
-        title_to_remove = st.selectbox("Select a book to remove", book_titles)
+        library = st.session_state.library
+        position = st.selectbox("Select a book to remove", range(len(library)),
+                                format_func=lambda i: f"{library[i]['title']} by {library[i]['author']}")
         if st.button("Remove Book"):
-            remove_book(title_to_remove)
+            remove_book(position)
     else:
         st.info("Your library is empty. Add some books first!")
 
-elif choice == "Search for Books":
+@st.fragment
+def render_search_books():
+    """Render the Search for Books page"""
     st.header("Search for Books")
-    search_by = st.radio("Search by:", ["title", "author", "genre"])
-    search_term = st.text_input(f"Enter {search_by} to search")
+    search_by = st.radio("Search by:", SEARCH_FIELDS, key="search_by")
+    search_term = st.text_input(f"Enter {search_by} to search", key="search_term")
     
-    if search_term:
-        results = search_books(search_term, search_by)
+    if search_term and len(search_term) < MIN_SEARCH_LENGTH:
+        st.info(f"Enter at least {MIN_SEARCH_LENGTH} characters to search.")
+    elif search_term:
+        results = cached("search_cache", (search_term.lower(), search_by),
+                         lambda: search_books(search_term, search_by))
         if results:
             st.subheader(f"Found {len(results)} book(s):")
             for book in results:
@@ -139,7 +302,9 @@ elif choice == "Search for Books":
         else:
             st.warning("No books found matching your search.")
 
-elif choice == "View All Books":
+@st.fragment
+def render_view_books():
+    """Render the View All Books page"""
     st.header("Your Library")
     if st.session_state.library:
         st.write(f"Total books: {len(st.session_state.library)}")
@@ -148,34 +313,33 @@ elif choice == "View All Books":
         sort_by = st.selectbox("Sort by", ["Recently Added", "Title", "Author", "Year"])
         reverse_sort = st.checkbox("Reverse order")
         
-        # Create a sorted copy of the library
-        sorted_library = st.session_state.library.copy()
+        order = cached("sort_cache", (sort_by, reverse_sort),
+                       lambda: sort_books(st.session_state.library, sort_by, reverse_sort))
         
-        if sort_by == "Recently Added":
-            sorted_library.sort(key=lambda x: x['added_date'], reverse=not reverse_sort)
-        elif sort_by == "Title":
-            sorted_library.sort(key=lambda x: x['title'].lower(), reverse=reverse_sort)
-        elif sort_by == "Author":
-            sorted_library.sort(key=lambda x: x['author'].lower(), reverse=reverse_sort)
-        elif sort_by == "Year":
-            sorted_library.sort(key=lambda x: x['year'], reverse=reverse_sort)
+        # Only render one page of books at a time
+        page_count = (len(order) + PAGE_SIZE - 1) // PAGE_SIZE
+        page = st.number_input("Page", min_value=1, max_value=page_count) if page_count > 1 else 1
         
-        for book in sorted_library:
+        for i in order[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]:
+            book = st.session_state.library[i]
             # Create expandable sections for each book
             with st.expander(f"{book['title']} by {book['author']}"):
-                col1, col2 = st.columns([3, 1])
-                col1.write(f"**Author:** {book['author']}")
-                col1.write(f"**Year:** {book['year']}")
-                col1.write(f"**Genre:** {book['genre']}")
-                col2.write(f"**Read:** {'Yes' if book['read_status'] else 'No'}")
-                col2.write(f"**Added:** {book['added_date']}")
+                st.markdown(
+                    f"**Author:** {book['author']}\n\n"
+                    f"**Year:** {book['year']}\n\n"
+                    f"**Genre:** {book['genre']}\n\n"
+                    f"**Read:** {'Yes' if book['read_status'] else 'No'}\n\n"
+                    f"**Added:** {book['added_date']}"
+                )
     else:
         st.info("Your library is empty. Add some books first!")
 
-elif choice == "View Statistics":
+@st.fragment
+def render_statistics():
+    """Render the View Statistics page"""
     st.header("Library Statistics")
     if st.session_state.library:
-        stats = calculate_statistics()
+        stats = cached("stats_cache", None, lambda: calculate_statistics(st.session_state.library))
         
         st.metric("Total Books", stats['total_books'])
         st.metric("Books Read", f"{stats['read_books']} ({stats['read_percentage']:.1f}%)")
@@ -184,23 +348,23 @@ elif choice == "View Statistics":
         # Visualizations
         col1, col2 = st.columns(2)
         with col1:
-            st.bar_chart({
-                "Read": [stats['read_books']],
-                "Unread": [stats['unread_books']]
-            })
+            st.altair_chart(build_read_status_chart(stats['read_books'], stats['unread_books']))
         with col2:
             st.write("Read Status Distribution")
             st.progress(stats['read_percentage'] / 100)
     else:
         st.info("Your library is empty. Add some books first to see statistics!")
 
-elif choice == "Save/Load Library":
+@st.fragment
+def render_save_load():
+    """Render the Save/Load Library page"""
     st.header("Save or Load Your Library")
     
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Save Library")
         save_filename = st.text_input("Save filename", "library.json")
+        st.caption("Use a .jsonl file to save one book per line; new books are then appended instead of rewriting the file.")
         if st.button("Save Library"):
             save_library_to_file(save_filename)
     
@@ -210,4 +374,16 @@ elif choice == "Save/Load Library":
         if st.button("Load Library"):
             load_library_from_file(load_filename)
     
-    st.warning("Note: Loading a library will replace your current library data.")
\ No newline at end of file
+    st.warning("Note: Loading a library will replace your current library data.")
+
+# Menu system
+pages = {
+    "Add a Book": render_add_book,
+    "Remove a Book": render_remove_book,
+    "Search for Books": render_search_books,
+    "View All Books": render_view_books,
+    "View Statistics": render_statistics,
+    "Save/Load Library": render_save_load,
+}
+choice = st.sidebar.selectbox("Menu", MENU_OPTIONS, key="menu")
+pages[choice]()